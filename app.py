@@ -1,10 +1,27 @@
 from flask import Flask, render_template, request, jsonify, send_file
+from flask.json.provider import JSONProvider
 import os
+import io
 import secrets
+import hashlib
+import orjson
 from werkzeug.utils import secure_filename
-from ats_logic import parse_resume, parse_jd, match_skills, fetch_courses_for_skills, generate_pdf_report
+from redis import Redis
+from rq import Queue
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from ats_logic import run_analysis, run_analysis_job
+
+class OrjsonProvider(JSONProvider):
+    """Serves jsonify() responses through orjson."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['REPORT_FOLDER'] = 'reports'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
@@ -13,10 +30,25 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['REPORT_FOLDER'], exist_ok=True)
 
+# Background analysis queue (run `rq worker analysis` alongside the web process). Jobs carry
+# the upload bytes and return the report bytes, so web and worker need no shared filesystem.
+REDIS_URL = os.getenv("REDIS_URL")
+queue = Queue('analysis', connection=Redis.from_url(REDIS_URL)) if REDIS_URL else None
+JOB_RESULT_TTL = 3600  # seconds a finished job (and its report) stays downloadable
+JOB_REPORT_PREFIX = "ATS_Report_job_"
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _copy_hashed(stream, out) -> str:
+    # Copy in 64KB chunks, hashing in the same pass (keys the resume cache)
+    h = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(65536), b''):
+        h.update(chunk)
+        out.write(chunk)
+    return h.hexdigest()
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     try:
@@ -32,40 +64,32 @@ def analyze():
         if not jd_text:
             return jsonify({'error': 'Job Description is required'}), 400
 
-        # 2. Save File
         filename = secure_filename(file.filename)
+
+        # 2. Queue the analysis when a Redis-backed worker is configured. The job carries the
+        # upload itself, so it is buffered in memory and never written to the web host's disk.
+        if queue is not None:
+            buf = io.BytesIO()
+            file_hash = _copy_hashed(file.stream, buf)
+            job = queue.enqueue(run_analysis_job, buf.getvalue(), filename, jd_text, file_hash,
+                                job_timeout=300, result_ttl=JOB_RESULT_TTL)
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status_url': f"/api/status/{job.id}"
+            }), 202
+
+        # 3. Otherwise save the file and analyze inline
         unique_id = secrets.token_hex(4)
         save_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
-        file.save(save_path)
+        with open(save_path, 'wb') as f:
+            file_hash = _copy_hashed(file.stream, f)
 
-        # 3. Processing
-        resume_data = parse_resume(save_path)
-        jd_data = parse_jd(jd_text)
-        
-        # 4. Matching
-        match_results = match_skills(resume_data.get('skills', []), jd_data.get('skills_required', []))
-        
-        # 5. Course Recommendations
-        recommendations = {}
-        if match_results['missing_skills']:
-            recommendations = fetch_courses_for_skills(match_results['missing_skills'])
-
-        # 6. Generate Report
         report_filename = f"ATS_Report_{unique_id}.pdf"
         report_path = os.path.join(app.config['REPORT_FOLDER'], report_filename)
-        
-        full_data = {
-            "resume_data": resume_data,
-            "jd_data": jd_data,
-            "match_details": match_results,
-            "match_score": match_results['score_percentage'],
-            "course_recommendations": recommendations,
-            "summary": f"Analysis for {resume_data.get('years_of_experience', 'N/A')} experience candidate."
-        }
-        
-        generate_pdf_report(full_data, report_path)
+        full_data = run_analysis(save_path, jd_text, report_path, file_hash)
 
-        # 7. Cleanup (Optional, keep for debugging for now)
+        # 4. Cleanup (Optional, keep for debugging for now)
         # os.remove(save_path)
 
         return jsonify({
@@ -79,9 +103,56 @@ def analyze():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def _fetch_job(job_id):
+    try:
+        return Job.fetch(job_id, connection=queue.connection)
+    except NoSuchJobError:
+        return None
+
+@app.route('/api/status/<job_id>')
+def job_status(job_id):
+    if queue is None:
+        return jsonify({'error': 'Background jobs are not enabled'}), 404
+    job = _fetch_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    state = job.get_status()
+    if state == 'finished':
+        result = job.return_value()
+        if result is None:
+            return jsonify({'state': state, 'success': False, 'error': 'Analysis result has expired'}), 410
+        return jsonify({
+            'state': state,
+            'success': True,
+            'data': result['data'],
+            'report_url': f"/api/download/{JOB_REPORT_PREFIX}{job.id}.pdf"
+        })
+    if state == 'failed':
+        result = job.latest_result()
+        exc_string = result.exc_string if result and result.exc_string else 'Analysis failed'
+        return jsonify({'state': state, 'success': False, 'error': exc_string.strip().splitlines()[-1]})
+    return jsonify({'state': state})
+
 @app.route('/api/download/<filename>')
 def download_report(filename):
-    return send_file(os.path.join(app.config['REPORT_FOLDER'], filename), as_attachment=True)
+    filename = secure_filename(filename)
+    # Reports never change once written, so let browsers revalidate (304) instead of re-downloading
+    path = os.path.join(app.config['REPORT_FOLDER'], filename)
+    if os.path.isfile(path):
+        return send_file(path, as_attachment=True, conditional=True, etag=True,
+                         last_modified=os.path.getmtime(path), max_age=3600)
+
+    # Reports built by a worker live in the job result until it expires
+    if queue is not None and filename.startswith(JOB_REPORT_PREFIX) and filename.endswith('.pdf'):
+        job = _fetch_job(filename[len(JOB_REPORT_PREFIX):-len('.pdf')])
+        result = job.return_value() if job is not None and job.get_status() == 'finished' else None
+        if result is not None:
+            return send_file(io.BytesIO(result['report_pdf']), mimetype='application/pdf',
+                             as_attachment=True, download_name=filename, conditional=True,
+                             etag=job.id, last_modified=job.ended_at, max_age=3600)
+
+    return jsonify({'error': 'Report not found'}), 404
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -1,56 +1,94 @@
-import json
 import os
 import io
 import base64
+import hashlib
+import logging
 import shutil
+import subprocess
 import tempfile
 import re
+import math
 import random
-import time
-import requests
+import threading
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import urllib.parse
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Union
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Iterator, Tuple, Union
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Third-party imports
+import orjson
 from pydantic import BaseModel
 import google.generativeai as genai
-from PIL import Image
-from bs4 import BeautifulSoup
+from diskcache import Cache
+from rapidfuzz import fuzz, process
 
-# PDF Processing
+# Fast HTML Parsing (falls back to bs4 + lxml)
 try:
-    import pypdfium2 as pdfium
+    from selectolax.parser import HTMLParser
 except ImportError:
-    pdfium = None
+    HTMLParser = None
 
-# DOCX Processing (Windows only usually)
+# PDF Processing
 try:
-    from docx2pdf import convert as docx2pdf_convert
+    import fitz  # PyMuPDF
 except ImportError:
-    docx2pdf_convert = None
+    fitz = None
+
+# Heavy or optional dependencies that only some code paths need (bs4, httpx, reportlab,
+# docx2pdf, numpy/numba) are imported lazily inside the functions that use them.
+np = None
 
-# Report Generation
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image as ReportLabImage
-from reportlab.lib.units import inch
+if TYPE_CHECKING:
+    import httpx
 
 # ════════════════════════════════════════════════
 # CONFIGURATION & SETUP
 # ════════════════════════════════════════════════
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = "gemini-2.5-flash"
 
+# Resume rasterization: 150 DPI is plenty for Gemini to read ~11pt text
+RENDER_DPI = int(os.getenv("ATS_RENDER_DPI", "150"))
+MAX_RENDER_PIXELS = 4_000_000  # Oversized pages are rendered at a lower DPI to stay under this
+RENDER_POOL_WORKERS = min(os.cpu_count() or 1, 4)
+
+# DOC/DOCX conversion through headless LibreOffice
+LIBREOFFICE_TIMEOUT = 30  # seconds
+
+# PDFs with a usable text layer are sent to Gemini as text instead of full-resolution page images
+MIN_RESUME_TEXT_CHARS = 500
+MIN_RESUME_TEXT_ASCII_RATIO = 0.8
+LAYOUT_PREVIEW_DPI = 72  # low-res page 1 sent with the text so layout fields can still be judged
+
+# Course recommendations: bundled catalog first, web scrape only for skills it doesn't cover
+COURSE_CATALOG_PATH = Path(__file__).parent / "data" / "skill_courses.json"
+COURSE_MATCH_CUTOFF = 85
+SCRAPE_COURSES_ON_MISS = os.getenv("ATS_SCRAPE_COURSES", "1") == "1"
+
 # Configure GenAI
 if API_KEY:
     genai.configure(api_key=API_KEY)
 
+# Shared by every parser call
+_GEN_CFG = genai.GenerationConfig(response_mime_type="application/json", temperature=0.1)
+
+# Parsed results keyed by content hash, shared across workers
+CACHE_DIR = os.getenv("ATS_CACHE_DIR", "cache")
+_resume_cache = Cache(os.path.join(CACHE_DIR, "resume"))
+_jd_cache = Cache(os.path.join(CACHE_DIR, "jd"))
+CACHE_EXPIRE = int(os.getenv("ATS_CACHE_EXPIRE", str(7 * 24 * 3600)))  # seconds
+
 # ════════════════════════════════════════════════
 # DATA MODELS
 # ════════════════════════════════════════════════
@@ -79,6 +117,79 @@ class JDInfo(BaseModel):
     minimum_qualification: str = ""
     location: str = ""
 
+class LLMResponseError(RuntimeError):
+    """Gemini answered, but its response couldn't be parsed into the expected JSON."""
+
+# ════════════════════════════════════════════════
+# PROMPTS
+# ════════════════════════════════════════════════
+
+RESUME_SCHEMA = (
+    "{skills: [], certificates: [], tools_and_tech: [], years_of_experience: str, education: str, "
+    "document_parsability: bool, file_format: str, document_structure: bool, document_structure_reason: str, "
+    "avoidance_of_non_parseable_elements: bool, avoidance_of_non_parseable_elements_reason: str, location: str}"
+)
+
+JD_SCHEMA = """{
+      "role": "Job Title",
+      "skills_required": ["skill1"],
+      "certificates_required": ["cert1"],
+      "tools_technologies": ["tool1"],
+      "years_of_experience_required": "string",
+      "required_qualification": "string",
+      "minimum_qualification": "string",
+      "location": "Location or Null"
+    }"""
+
+RESUME_SYSTEM_PROMPT = (
+    "You are a resume parser. Analyze the resume (page images, or extracted text plus a first-page preview image) and extract fields for the JSON schema. "
+    "Return one valid JSON object. Use 'Null' for unknowns.\n"
+    "Guidelines:\n"
+    "- Extract EXPLICIT skills only.\n"
+    "- Expand ALL abbreviations (AWS -> Amazon Web Services).\n"
+    "- Evaluate document_parsability, document_structure, avoidance_of_non_parseable_elements.\n"
+    "- Judge document_structure and avoidance_of_non_parseable_elements from the page images.\n"
+    f"- Schema: {RESUME_SCHEMA}"
+)
+
+JD_SYSTEM_PROMPT = f"""
+    Extract job info from the job description text into JSON.
+    Schema:
+    {JD_SCHEMA}
+    Rules:
+    - Split combined skills.
+    - Expand ALL abbreviations.
+    - Use 'Null' for empty fields.
+    """
+
+COMBINED_SYSTEM_PROMPT = (
+    "You are a resume and job description parser. The resume is given as page images, or as extracted text plus a first-page preview image, the job description as text. "
+    "Return one valid JSON object of the form {\"resume\": {...}, \"jd\": {...}}. Use 'Null' for unknowns.\n"
+    "Resume guidelines:\n"
+    "- Extract EXPLICIT skills only.\n"
+    "- Expand ALL abbreviations (AWS -> Amazon Web Services).\n"
+    "- Evaluate document_parsability, document_structure, avoidance_of_non_parseable_elements.\n"
+    "- Judge document_structure and avoidance_of_non_parseable_elements from the page images.\n"
+    f"- Schema: {RESUME_SCHEMA}\n"
+    "JD guidelines:\n"
+    "- Split combined skills.\n"
+    "- Expand ALL abbreviations.\n"
+    f"- Schema: {JD_SCHEMA}"
+)
+
+SYSTEM_PROMPTS = {
+    "resume": RESUME_SYSTEM_PROMPT,
+    "jd": JD_SYSTEM_PROMPT,
+    "combined": COMBINED_SYSTEM_PROMPT,
+}
+
+# ════════════════════════════════════════════════
+# MODELS
+# ════════════════════════════════════════════════
+
+# One model per static system prompt, reused across requests (construction makes no network calls)
+_MODELS = {name: genai.GenerativeModel(MODEL_NAME, system_instruction=prompt) for name, prompt in SYSTEM_PROMPTS.items()}
+
 # ════════════════════════════════════════════════
 # RESUME PARSING LOGIC
 # ════════════════════════════════════════════════
@@ -89,112 +200,205 @@ def _get_file_format(path: Path) -> str:
         raise ValueError("Unsupported file format. Accepted: .pdf, .doc, .docx")
     return ext
 
-def _pdf_to_base64_images(pdf_path: Path, dpi: int = 200) -> List[str]:
-    if pdfium is None:
-        raise RuntimeError("pypdfium2 is required to render PDFs.")
-    images_b64 = []
-    pdf = pdfium.PdfDocument(str(pdf_path))
-    for page_index in range(len(pdf)):
-        page = pdf.get_page(page_index)
-        bitmap = page.render(scale=dpi / 72.0)
-        pil_image = bitmap.to_pil()
-        buf = io.BytesIO()
-        pil_image.save(buf, format="PNG")
-        images_b64.append(base64.b64encode(buf.getvalue()).decode("utf-8"))
-        page.close()
-    return images_b64
-
-def _doc_to_pdf(src_path: Path) -> Path:
-    if docx2pdf_convert is None:
-        raise RuntimeError("docx2pdf is not installed or available on this system.")
-    
-    # Simple check for Windows/Office requirement could be added here
-    # For now we assume if the import succeeded, it might work
-    
-    tmp_dir = Path(tempfile.mkdtemp(prefix="resume_doc2pdf_"))
-    out_pdf = tmp_dir / (src_path.stem + ".pdf")
+def _render_page_base64(pdf_path: Path, page_index: int, dpi: int) -> str:
+    # Each worker opens its own document; fitz.Document handles can't be shared across processes
+    with fitz.open(str(pdf_path)) as doc:
+        page = doc.load_page(page_index)
+        pixels = (page.rect.width * dpi / 72.0) * (page.rect.height * dpi / 72.0)
+        if pixels > MAX_RENDER_PIXELS:
+            dpi = int(dpi * math.sqrt(MAX_RENDER_PIXELS / pixels))
+        pix = page.get_pixmap(dpi=dpi)
+        return base64.b64encode(pix.tobytes("jpeg", jpg_quality=85)).decode("utf-8")
+
+# One long-lived spawn pool per process. Forking per call from a process that already
+# runs gRPC threads can deadlock, and pool startup would eat most of the gain anyway.
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_POOL_WORKERS,
+                                               mp_context=multiprocessing.get_context("spawn"))
+        return _render_pool
+
+def _reset_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+def _pdf_to_base64_images(pdf_path: Path, dpi: int = RENDER_DPI) -> List[str]:
+    if fitz is None:
+        raise RuntimeError("PyMuPDF is required to render PDFs.")
+    with fitz.open(str(pdf_path)) as doc:
+        n_pages = doc.page_count
+
+    # Skip the pool on single-page resumes and single-core hosts
+    if n_pages < 2 or RENDER_POOL_WORKERS < 2:
+        return [_render_page_base64(pdf_path, i, dpi) for i in range(n_pages)]
+
+    # Rendering is CPU bound, so fan pages out across processes (map keeps page order)
     try:
-        docx2pdf_convert(str(src_path), str(tmp_dir))
-    except Exception as e:
-        raise RuntimeError(f"docx2pdf conversion failed: {e}")
+        return list(_get_render_pool().map(_render_page_base64, [pdf_path] * n_pages, range(n_pages), [dpi] * n_pages))
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); start a fresh pool next time and render this one serially
+        _reset_render_pool()
+        return [_render_page_base64(pdf_path, i, dpi) for i in range(n_pages)]
+
+def _doc_to_pdf(src_path: Path, out_dir: Path) -> Path:
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    if soffice:
+        _libreoffice_convert(soffice, src_path, out_dir)
+    else:
+        # DOCX Processing via MS Word (Windows/macOS only)
+        try:
+            from docx2pdf import convert as docx2pdf_convert
+        except ImportError:
+            raise RuntimeError("Neither LibreOffice nor docx2pdf is available on this system.")
+        try:
+            docx2pdf_convert(str(src_path), str(out_dir))
+        except Exception as e:
+            raise RuntimeError(f"docx2pdf conversion failed: {e}")
         
+    out_pdf = out_dir / (src_path.stem + ".pdf")
     if not out_pdf.exists():
-        pdfs = list(tmp_dir.glob("*.pdf"))
+        pdfs = list(out_dir.glob("*.pdf"))
         if not pdfs:
             raise RuntimeError("Failed to convert document to PDF.")
         return pdfs[0]
     return out_pdf
 
-def parse_resume(file_path: str, target_location: Optional[str] = None) -> Dict[str, Any]:
-    """Parses a resume file and extracts structured data using Gemini."""
+def _libreoffice_convert(soffice: str, src_path: Path, out_dir: Path):
+    # A throwaway profile per call lets concurrent conversions run without fighting over the profile lock
+    profile = (out_dir / "lo_profile").resolve().as_uri()
+    cmd = [soffice, "--headless", "--norestore", f"-env:UserInstallation={profile}",
+           "--convert-to", "pdf", "--outdir", str(out_dir), str(src_path)]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=LIBREOFFICE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"LibreOffice conversion timed out after {LIBREOFFICE_TIMEOUT}s")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"LibreOffice conversion failed: {e.stderr.decode(errors='replace').strip()}")
+
+@contextmanager
+def _doc_to_pdf_ctx(src_path: Path) -> Iterator[Path]:
+    """Converts a document to a PDF inside a temp dir that is removed on exit."""
+    with tempfile.TemporaryDirectory(prefix="resume_doc2pdf_") as tmp_dir:
+        yield _doc_to_pdf(src_path, Path(tmp_dir))
+
+def _extract_text(pdf_path: Path) -> Optional[str]:
+    """Returns the PDF's text layer if it looks like real resume text, else None (e.g. scanned resumes)."""
+    with fitz.open(str(pdf_path)) as doc:
+        text = "\n".join(page.get_text("text") for page in doc).strip()
+    if len(text) <= MIN_RESUME_TEXT_CHARS:
+        return None
+    # Broken font encodings extract as garbage; fall back to vision for those
+    ascii_ratio = sum(c.isascii() for c in text) / len(text)
+    return text if ascii_ratio > MIN_RESUME_TEXT_ASCII_RATIO else None
+
+def _pdf_parts(pdf_path: Path) -> List[Any]:
+    if fitz is None:
+        raise RuntimeError("PyMuPDF is required to render PDFs.")
+    text = _extract_text(pdf_path)
+    if text:
+        preview = _render_page_base64(pdf_path, 0, LAYOUT_PREVIEW_DPI)
+        return [f"Resume Text:\n{text}", *_image_parts([preview])]
+    return _image_parts(_pdf_to_base64_images(pdf_path))
+
+def _resume_parts(path: Path, file_format: str) -> List[Any]:
+    """Gemini content parts for a resume: its text when extractable, rendered pages otherwise."""
+    if file_format == ".pdf":
+        return _pdf_parts(path)
+
+    try:
+        with _doc_to_pdf_ctx(path) as tmp_pdf:
+            return _pdf_parts(tmp_pdf)
+    except Exception as e:
+        # Fallback or error if docx fails (needs LibreOffice, or MS Word via docx2pdf)
+        raise RuntimeError(f"DOCX conversion failed (System might lack LibreOffice): {e}")
+
+def _image_parts(images_b64: List[str]) -> List[Dict[str, Any]]:
+    return [{"inline_data": {"mime_type": "image/jpeg", "data": b64}} for b64 in images_b64]
+
+def _to_bool(v) -> bool:
+    if isinstance(v, bool): return v
+    return str(v).lower() in ('true', 'yes', '1')
+
+def _normalize_resume_data(data: Dict[str, Any], file_format: str) -> Dict[str, Any]:
+    # Normalize list fields
+    for field in ['skills', 'certificates', 'tools_and_tech']:
+        if not isinstance(data.get(field), list):
+            data[field] = [data[field]] if data.get(field) else []
+
+    # Normalize boolean fields
+    data['document_parsability'] = _to_bool(data.get('document_parsability'))
+    data['document_structure'] = _to_bool(data.get('document_structure'))
+    data['avoidance_of_non_parseable_elements'] = _to_bool(data.get('avoidance_of_non_parseable_elements'))
+    data['file_format'] = file_format
+    return data
+
+def _normalize_jd_data(data: Any) -> Dict[str, Any]:
+    if isinstance(data, list): data = data[0]
+
+    # Ensure lists
+    for field in ['skills_required', 'certificates_required', 'tools_technologies']:
+        if not isinstance(data.get(field), list):
+           data[field] = [data[field]] if data.get(field) else ["Null"]
+    return data
+
+def _prompt_fingerprint(*prompts: str) -> str:
+    return hashlib.sha256("\0".join((MODEL_NAME,) + prompts).encode("utf-8")).hexdigest()[:16]
+
+# Cached entries are tied to the model and every prompt that can produce them,
+# so a prompt or model change never serves stale results
+_RESUME_CACHE_VERSION = _prompt_fingerprint(RESUME_SYSTEM_PROMPT, COMBINED_SYSTEM_PROMPT)
+_JD_CACHE_VERSION = _prompt_fingerprint(JD_SYSTEM_PROMPT, COMBINED_SYSTEM_PROMPT)
+
+def _resume_cache_key(file_hash: str, target_location: Optional[str]) -> str:
+    return f"{_RESUME_CACHE_VERSION}:{file_hash}:{target_location or ''}"
+
+def _jd_cache_key(jd_text: str) -> str:
+    return f"{_JD_CACHE_VERSION}:{hashlib.sha256(jd_text.encode('utf-8')).hexdigest()}"
+
+def parse_resume(file_path: str, target_location: Optional[str] = None, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Parses a resume file and extracts structured data using Gemini.
+    
+    If the SHA256 `file_hash` of the upload is given, results are cached under it.
+    """
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
+
+    cache_key = _resume_cache_key(file_hash, target_location) if file_hash else None
+    if cache_key:
+        cached = _resume_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
     file_format = _get_file_format(path)
-    images_b64 = []
+    resume_parts = _resume_parts(path, file_format)
 
-    # Handle conversion
-    if file_format == ".pdf":
-        images_b64 = _pdf_to_base64_images(path)
-    else:
-        tmp_pdf = None
-        try:
-            tmp_pdf = _doc_to_pdf(path)
-            images_b64 = _pdf_to_base64_images(tmp_pdf)
-        except Exception as e:
-            # Fallback or error if docx fails (common in linux deployments)
-            raise RuntimeError(f"DOCX conversion failed (System might lack MS Word): {e}")
-        finally:
-            if tmp_pdf and tmp_pdf.parent.exists():
-                shutil.rmtree(tmp_pdf.parent, ignore_errors=True)
-
-    # Prepare LLM request
-    model = genai.GenerativeModel(MODEL_NAME)
+    # Prepare LLM request (static instructions live in the system prompt)
     location_clause = f"Target location for proximity assessment: {target_location}. " if target_location else ""
-    
-    prompt = (
-        "You are a resume parser. Analyze the resume images and extract fields for the JSON schema. "
-        "Return one valid JSON object. Use 'Null' for unknowns.\n"
-        f"{location_clause}\n"
-        "Guidelines:\n"
-        "- Extract EXPLICIT skills only.\n"
-        "- Expand ALL abbreviations (AWS -> Amazon Web Services).\n"
-        "- Evaluate document_parsability, document_structure, avoidance_of_non_parseable_elements.\n"
-        "- Schema: {skills: [], certificates: [], tools_and_tech: [], years_of_experience: str, education: str, "
-        "document_parsability: bool, file_format: str, document_structure: bool, document_structure_reason: str, "
-        "avoidance_of_non_parseable_elements: bool, avoidance_of_non_parseable_elements_reason: str, location: str}"
-    )
-
-    payload = [{"inline_data": {"mime_type": "image/png", "data": b64}} for b64 in images_b64]
-    content = [prompt] + payload
+    content = ([location_clause] if location_clause else []) + resume_parts
 
-    response = model.generate_content(
+    response = _MODELS["resume"].generate_content(
         content,
-        generation_config=genai.GenerationConfig(response_mime_type="application/json", temperature=0.1)
+        generation_config=_GEN_CFG
     )
     
     # Parse Response
     try:
-        data = json.loads(response.text)
-        # Normalize list fields
-        for field in ['skills', 'certificates', 'tools_and_tech']:
-            if not isinstance(data.get(field), list):
-                data[field] = [data[field]] if data.get(field) else []
-        
-        # Normalize boolean fields
-        def _to_bool(v):
-            if isinstance(v, bool): return v
-            return str(v).lower() in ('true', 'yes', '1')
-
-        data['document_parsability'] = _to_bool(data.get('document_parsability'))
-        data['document_structure'] = _to_bool(data.get('document_structure'))
-        data['avoidance_of_non_parseable_elements'] = _to_bool(data.get('avoidance_of_non_parseable_elements'))
-        data['file_format'] = file_format
-        
-        return data
+        data = _normalize_resume_data(orjson.loads(response.text), file_format)
     except Exception as e:
-        raise RuntimeError(f"Parsing LLM response failed: {e}")
+        raise LLMResponseError(f"Parsing LLM response failed: {e}")
+
+    if cache_key:
+        _resume_cache.set(cache_key, data, expire=CACHE_EXPIRE)
+    return data
 
 # ════════════════════════════════════════════════
 # JD PARSING LOGIC
@@ -202,58 +406,84 @@ def parse_resume(file_path: str, target_location: Optional[str] = None) -> Dict[
 
 def parse_jd(jd_text: str) -> Dict[str, Any]:
     """Parses unstructured JD text into structured JSON."""
-    model = genai.GenerativeModel(MODEL_NAME)
-    prompt = f"""
-    Extract job info from the text below into JSON.
-    Schema:
-    {{
-      "role": "Job Title",
-      "skills_required": ["skill1"],
-      "certificates_required": ["cert1"],
-      "tools_technologies": ["tool1"],
-      "years_of_experience_required": "string",
-      "required_qualification": "string",
-      "minimum_qualification": "string",
-      "location": "Location or Null"
-    }}
-    Rules:
-    - Split combined skills.
-    - Expand ALL abbreviations.
-    - Use 'Null' for empty fields.
+    cache_key = _jd_cache_key(jd_text)
+    cached = _jd_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    response = _MODELS["jd"].generate_content(
+        f"JD Text:\n{jd_text}",
+        generation_config=_GEN_CFG
+    )
     
-    JD Text:
-    {jd_text}
-    """
+    try:
+        data = _normalize_jd_data(orjson.loads(response.text))
+    except Exception as e:
+        raise LLMResponseError(f"JD Parsing failed: {e}")
+
+    _jd_cache.set(cache_key, data, expire=CACHE_EXPIRE)
+    return data
+
+# ════════════════════════════════════════════════
+# COMBINED PARSING LOGIC
+# ════════════════════════════════════════════════
+
+def parse_resume_and_jd(file_path: str, jd_text: str, target_location: Optional[str] = None, file_hash: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Parses a resume and a JD in a single Gemini request. Returns (resume_data, jd_data).
     
-    response = model.generate_content(
-        prompt,
-        generation_config=genai.GenerationConfig(response_mime_type="application/json", temperature=0.1)
+    Cached halves are reused; if only one side is cached the other goes through its own parser.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    resume_key = _resume_cache_key(file_hash, target_location) if file_hash else None
+    jd_key = _jd_cache_key(jd_text)
+    cached_resume = _resume_cache.get(resume_key) if resume_key else None
+    cached_jd = _jd_cache.get(jd_key)
+    if cached_resume is not None and cached_jd is not None:
+        return cached_resume, cached_jd
+    if cached_resume is not None:
+        return cached_resume, parse_jd(jd_text)
+    if cached_jd is not None:
+        return parse_resume(file_path, target_location, file_hash), cached_jd
+
+    file_format = _get_file_format(path)
+    resume_parts = _resume_parts(path, file_format)
+
+    location_clause = f"Target location for proximity assessment: {target_location}. " if target_location else ""
+    content = ([location_clause] if location_clause else []) + [f"JD Text:\n{jd_text}"] + resume_parts
+
+    response = _MODELS["combined"].generate_content(
+        content,
+        generation_config=_GEN_CFG
     )
-    
+
     try:
-        data = json.loads(response.text)
-        if isinstance(data, list): data = data[0]
-        
-        # Ensure lists
-        for field in ['skills_required', 'certificates_required', 'tools_technologies']:
-            if not isinstance(data.get(field), list):
-               data[field] = [data[field]] if data.get(field) else ["Null"]
-        
-        return data
+        data = orjson.loads(response.text)
+        resume_data, jd_data = _normalize_resume_data(data['resume'], file_format), _normalize_jd_data(data['jd'])
     except Exception as e:
-        raise RuntimeError(f"JD Parsing failed: {e}")
+        raise LLMResponseError(f"Combined parsing failed: {e}")
+
+    if resume_key:
+        _resume_cache.set(resume_key, resume_data, expire=CACHE_EXPIRE)
+    _jd_cache.set(jd_key, jd_data, expire=CACHE_EXPIRE)
+    return resume_data, jd_data
 
 # ════════════════════════════════════════════════
 # SKILL MATCHING LOGIC
 # ════════════════════════════════════════════════
 
+_WS_RE = re.compile(r'\s+')
+
 def normalize_skill(s: str) -> str:
-    return re.sub(r'\s+', ' ', s.strip().lower())
+    return _WS_RE.sub(' ', s.strip().lower())
 
 def match_skills(resume_skills: List[str], jd_skills: List[str]) -> Dict[str, Any]:
     """Matches resume skills against JD skills."""
     res_norm = {normalize_skill(s) for s in resume_skills}
-    jd_norm = {normalize_skill(s) for s in jd_skills}
+    jd_pairs = [(s, normalize_skill(s)) for s in jd_skills]
+    jd_norm = {n for _, n in jd_pairs}
     
     # Filter out "null"
     res_norm.discard('null')
@@ -263,11 +493,13 @@ def match_skills(resume_skills: List[str], jd_skills: List[str]) -> Dict[str, An
     matched_norm = jd_norm & res_norm
     missing_norm = jd_norm - res_norm
     
-    # Convert back to original casing (User's exact logic)
-    matched_original = [skill for skill in jd_skills if normalize_skill(skill) in matched_norm]
-    missing_original = [skill for skill in jd_skills if normalize_skill(skill) in missing_norm]
+    return _match_result(jd_pairs, matched_norm, missing_norm, len(jd_norm))
+
+def _match_result(jd_pairs: List[Tuple[str, str]], matched_norm: set, missing_norm: set, total: int) -> Dict[str, Any]:
+    # Convert back to original casing (User's exact logic); jd_pairs holds (original, normalized)
+    matched_original = [skill for skill, norm in jd_pairs if norm in matched_norm]
+    missing_original = [skill for skill, norm in jd_pairs if norm in missing_norm]
     
-    total = len(jd_norm)
     match_count = len(matched_norm)
     percent = round((match_count / total) * 100, 1) if total > 0 else 0
     
@@ -279,8 +511,64 @@ def match_skills(resume_skills: List[str], jd_skills: List[str]) -> Dict[str, An
         "matched_count": match_count
     }
 
+# JIT matcher, compiled on first use; False once numba is known to be unavailable
+_matched_mask = None
+
+def _load_matched_mask():
+    global np, _matched_mask
+    if _matched_mask is None:
+        try:
+            import numpy as np
+            from numba import njit
+        except ImportError:
+            _matched_mask = False
+            return None
+
+        @njit
+        def _mask(res_ids, jd_ids):
+            # Two-pointer walk over sorted, unique id arrays
+            mask = np.zeros(jd_ids.shape[0], dtype=np.bool_)
+            i = 0
+            for j in range(jd_ids.shape[0]):
+                while i < res_ids.shape[0] and res_ids[i] < jd_ids[j]:
+                    i += 1
+                if i < res_ids.shape[0] and res_ids[i] == jd_ids[j]:
+                    mask[j] = True
+            return mask
+
+        _matched_mask = _mask
+    return _matched_mask or None
+
+def match_skills_batch(resume_skills: List[str], jds: List[List[str]]) -> List[Dict[str, Any]]:
+    """Matches one resume's skills against many JDs' skills (same result shape as match_skills)."""
+    matched_mask = _load_matched_mask()
+    if matched_mask is None:
+        return [match_skills(resume_skills, jd_skills) for jd_skills in jds]
+
+    # Shared normalized skill -> int id table
+    ids: Dict[str, int] = {}
+    def _ids_for(norms: set):
+        return np.array(sorted(ids.setdefault(n, len(ids)) for n in norms), dtype=np.int32)
+
+    res_norm = {normalize_skill(s) for s in resume_skills}
+    res_norm.discard('null')
+    res_ids = _ids_for(res_norm)
+    
+    results = []
+    for jd_skills in jds:
+        jd_pairs = [(s, normalize_skill(s)) for s in jd_skills]
+        jd_norm = {n for _, n in jd_pairs}
+        jd_norm.discard('null')
+        jd_ids = _ids_for(jd_norm)
+        mask = matched_mask(res_ids, jd_ids)
+        
+        matched_ids = set(jd_ids[mask].tolist())
+        matched_norm = {n for n in jd_norm if ids[n] in matched_ids}
+        results.append(_match_result(jd_pairs, matched_norm, jd_norm - matched_norm, len(jd_norm)))
+    return results
+
 # ════════════════════════════════════════════════
-# COURSE SCRAPING LOGIC
+# COURSE RECOMMENDATION LOGIC
 # ════════════════════════════════════════════════
 
 USER_AGENTS = [
@@ -288,67 +576,117 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)",
 ]
 
-def _safe_request(url):
+async def _safe_request(client: "httpx.AsyncClient", url):
     headers = {"User-Agent": random.choice(USER_AGENTS)}
     try:
-        return requests.get(url, headers=headers, timeout=5)
+        return await client.get(url, headers=headers)
     except:
         return None
 
-def fetch_courses_for_skills(skills: List[str]) -> Dict[str, List[Dict[str, str]]]:
-    """Fetches course recommendations for a list of missing skills."""
-    recommendations = {}
-    
-    # Limit to top 3 skills to avoid long wait times
-    skills_to_search = skills[:3]
+def _select_links(html: bytes, selector: str, limit: int) -> List[Tuple[str, str]]:
+    """Returns (text, href) for the first `limit` elements matching a CSS selector."""
+    if HTMLParser is not None:
+        return [(node.text(strip=True), node.attributes.get("href") or "") for node in HTMLParser(html).css(selector)[:limit]]
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    return [(tag.get_text(strip=True), tag.get("href", "")) for tag in soup.select(selector)[:limit]]
+
+async def _scrape_skill(client: "httpx.AsyncClient", skill: str) -> Tuple[str, List[Dict[str, str]]]:
+    skill_recs = []
     
-    for skill in skills_to_search:
-        skill_recs = []
-        
-        # 1. DuckDuckGo Scrape
+    # 1. DuckDuckGo Scrape
+    try:
+        url = f"https://duckduckgo.com/html/?q={'top online courses for ' + skill}".replace(" ", "+")
+        resp = await _safe_request(client, url)
+        if resp and resp.status_code == 200:
+            for title, link in _select_links(resp.content, "a.result__a", 2):
+                if "uddg=" in link:
+                    parsed = urllib.parse.urlparse(link)
+                    link = urllib.parse.parse_qs(parsed.query).get("uddg", [""])[0]
+                if link.startswith("http"):
+                    skill_recs.append({"title": title, "link": link})
+    except:
+        pass
+
+    # 2. Coursera Scrape (Backup)
+    if len(skill_recs) < 2:
         try:
-            url = f"https://duckduckgo.com/html/?q={'top online courses for ' + skill}".replace(" ", "+")
-            resp = _safe_request(url)
+            url = f"https://www.coursera.org/search?query={skill.replace(' ','%20')}"
+            resp = await _safe_request(client, url)
             if resp and resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, "html.parser")
-                for tag in soup.select("a.result__a")[:2]:
-                    title = tag.get_text(strip=True)
-                    link = tag.get("href", "")
-                    if "uddg=" in link:
-                        parsed = urllib.parse.urlparse(link)
-                        link = urllib.parse.parse_qs(parsed.query).get("uddg", [""])[0]
-                    if link.startswith("http"):
-                        skill_recs.append({"title": title, "link": link})
+                for title, href in _select_links(resp.content, 'a[data-click-key="search.search.click.search_card"]', 1):
+                    link = "https://www.coursera.org" + href
+                    skill_recs.append({"title": title, "link": link})
         except:
             pass
+            
+    return skill, skill_recs
+
+@lru_cache(maxsize=1)
+def _load_course_catalog() -> Dict[str, List[Dict[str, str]]]:
+    # String values are aliases ("reactjs": "react") that share the canonical entry's courses
+    raw = {normalize_skill(skill): entry for skill, entry in orjson.loads(COURSE_CATALOG_PATH.read_bytes()).items()}
+    return {skill: raw[normalize_skill(entry)] if isinstance(entry, str) else entry for skill, entry in raw.items()}
+
+_PUNCT_RE = re.compile(r'[^\w+#]+')
+# Words shared by many unrelated skills; scored, they make "Product Management" look like "Project Management"
+_GENERIC_COURSE_TOKENS = frozenset({"programming", "language", "development", "management", "js"})
+
+def _course_tokens(s: str) -> str:
+    # Split "react.js" / "scikit-learn" into words, keep "c++" and "c#" intact, and drop generic words
+    return ' '.join(t for t in _PUNCT_RE.sub(' ', s).split() if t not in _GENERIC_COURSE_TOKENS)
+
+@lru_cache(maxsize=1)
+def _fuzzy_course_keys() -> Dict[str, str]:
+    # Keys that shrink to three characters or fewer ("r", "go programming", ".net") only ever match exactly;
+    # fuzzily they would claim "R&D", "C Programming" or "Nest.js"
+    tokens = {skill: _course_tokens(skill) for skill in _load_course_catalog()}
+    return {skill: t for skill, t in tokens.items() if len(t) > 3}
+
+def _catalog_courses(skill: str) -> List[Dict[str, str]]:
+    catalog = _load_course_catalog()
+    norm = normalize_skill(skill)
+    if norm not in catalog:
+        # token_sort_ratio scores the whole string, so "Web Development" doesn't borrow
+        # "Android Development" the way a subset match would
+        match = process.extractOne(_course_tokens(norm), _fuzzy_course_keys(), scorer=fuzz.token_sort_ratio,
+                                   score_cutoff=COURSE_MATCH_CUTOFF)
+        if match is None:
+            return []
+        norm = match[2]
+    return [dict(course) for course in catalog[norm]]
 
-        # 2. Coursera Scrape (Backup)
-        if len(skill_recs) < 2:
-            try:
-                url = f"https://www.coursera.org/search?query={skill.replace(' ','%20')}"
-                resp = _safe_request(url)
-                if resp and resp.status_code == 200:
-                    soup = BeautifulSoup(resp.text, "html.parser")
-                    for a in soup.select('a[data-click-key="search.search.click.search_card"]')[:1]:
-                        title = a.get_text(strip=True)
-                        link = "https://www.coursera.org" + a.get("href", "")
-                        skill_recs.append({"title": title, "link": link})
-            except:
-                pass
-                
-        recommendations[skill] = skill_recs
-        time.sleep(1) # Be polite
-        
+def fetch_courses_for_skills(skills: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    """Recommends courses for missing skills from the bundled catalog, scraping the web only on misses."""
+    recommendations = {skill: _catalog_courses(skill) for skill in skills}
+
+    # Limit scraping to 3 skills to avoid long wait times
+    misses = [skill for skill, courses in recommendations.items() if not courses][:3]
+    if misses and SCRAPE_COURSES_ON_MISS:
+        recommendations.update(asyncio.run(_fetch_courses_async(misses)))
     return recommendations
 
+async def _fetch_courses_async(skills: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    # All skills share one client (HTTP/2 multiplexed per host); gather keeps skill order
+    import httpx
+
+    async with httpx.AsyncClient(http2=True, timeout=5, follow_redirects=True) as client:
+        return dict(await asyncio.gather(*(_scrape_skill(client, skill) for skill in skills)))
+
 # ════════════════════════════════════════════════
 # PDF REPORT GENERATION
 # ════════════════════════════════════════════════
 
 def generate_pdf_report(data: Dict[str, Any], output_path: str):
     """Generates a comprehensive PDF report."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.units import inch
     
-    doc = SimpleDocTemplate(output_path, pagesize=letter, topMargin=50, bottomMargin=50)
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=letter, topMargin=50, bottomMargin=50)
     styles = getSampleStyleSheet()
     story = []
 
@@ -356,16 +694,19 @@ def generate_pdf_report(data: Dict[str, Any], output_path: str):
     title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=24, textColor=colors.HexColor("#1e1b4b"), alignment=1, spaceAfter=20)
     h2_style = ParagraphStyle('Header2', parent=styles['Heading2'], fontSize=16, textColor=colors.HexColor("#4f46e5"), spaceBefore=15, spaceAfter=10)
     normal_style = ParagraphStyle('Normal', parent=styles['Normal'], fontSize=11, textColor=colors.HexColor("#374151"), leading=14)
+    date_style = ParagraphStyle('Date', parent=normal_style, alignment=1)
+    score_style = ParagraphStyle('Score', parent=title_style, fontSize=30)
+    link_style = ParagraphStyle('Link', parent=normal_style, fontSize=9)
     
     # Title
     story.append(Paragraph("ATS Analysis Report", title_style))
-    story.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y')}", ParagraphStyle('Date', parent=normal_style, alignment=1)))
+    story.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y')}", date_style))
     story.append(Spacer(1, 20))
     
     # Score Section
     score = data.get('match_score', 0)
     color = colors.green if score >= 80 else (colors.orange if score >= 50 else colors.red)
-    story.append(Paragraph(f"Overall Match Score: <font color={color}>{score}%</font>", ParagraphStyle('Score', parent=title_style, fontSize=30)))
+    story.append(Paragraph(f"Overall Match Score: <font color={color}>{score}%</font>", score_style))
     story.append(Spacer(1, 20))
     
     # Candidate Info
@@ -409,7 +750,60 @@ def generate_pdf_report(data: Dict[str, Any], output_path: str):
             story.append(Paragraph(f"<b>{skill}</b>", normal_style))
             for c in courses:
                 link = f'<a href="{c["link"]}" color="blue">{c["link"]}</a>'
-                story.append(Paragraph(f"• {c['title']}: {link}", ParagraphStyle('Link', parent=normal_style, fontSize=9)))
+                story.append(Paragraph(f"• {c['title']}: {link}", link_style))
             story.append(Spacer(1, 5))
 
+    # Build in memory, then write the file in one go
     doc.build(story)
+    Path(output_path).write_bytes(buf.getvalue())
+
+# ════════════════════════════════════════════════
+# ANALYSIS PIPELINE
+# ════════════════════════════════════════════════
+
+def run_analysis(save_path: str, jd_text: str, report_path: str, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    """Runs the full resume vs JD analysis and writes the PDF report. Safe to run on an RQ worker."""
+    # 1. Processing (single Gemini call, separate parsers as fallback)
+    try:
+        resume_data, jd_data = parse_resume_and_jd(save_path, jd_text, file_hash=file_hash)
+    except LLMResponseError as e:
+        # Only a malformed combined response is retried; conversion and API errors propagate
+        logger.warning("Combined resume/JD parse failed, falling back to separate calls: %s", e)
+        # The two parses are independent, so overlap their Gemini round-trips
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            jd_future = ex.submit(parse_jd, jd_text)
+            resume_data = parse_resume(save_path, file_hash=file_hash)
+            jd_data = jd_future.result()
+    
+    # 2. Matching
+    match_results = match_skills(resume_data.get('skills', []), jd_data.get('skills_required', []))
+    
+    # 3. Course Recommendations
+    recommendations = {}
+    if match_results['missing_skills']:
+        recommendations = fetch_courses_for_skills(match_results['missing_skills'])
+
+    # 4. Generate Report
+    full_data = {
+        "resume_data": resume_data,
+        "jd_data": jd_data,
+        "match_details": match_results,
+        "match_score": match_results['score_percentage'],
+        "course_recommendations": recommendations,
+        "summary": f"Analysis for {resume_data.get('years_of_experience', 'N/A')} experience candidate."
+    }
+    
+    generate_pdf_report(full_data, report_path)
+    return full_data
+
+def run_analysis_job(resume_bytes: bytes, filename: str, jd_text: str, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    """RQ entry point: analyzes uploaded bytes in a temp dir and returns {data, report_pdf}.
+
+    Nothing is read from or left on the worker's disk, so it needn't share a filesystem with the web process.
+    """
+    with tempfile.TemporaryDirectory(prefix="ats_job_") as tmp_dir:
+        save_path = os.path.join(tmp_dir, filename)
+        report_path = os.path.join(tmp_dir, "report.pdf")
+        Path(save_path).write_bytes(resume_bytes)
+        data = run_analysis(save_path, jd_text, report_path, file_hash)
+        return {"data": data, "report_pdf": Path(report_path).read_bytes()}
@@ -34,6 +34,21 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    const POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+    async function pollJob(statusUrl) {
+        const deadline = Date.now() + POLL_TIMEOUT_MS;
+        while (Date.now() < deadline) {
+            await new Promise(resolve => setTimeout(resolve, 2000));
+            const response = await fetch(statusUrl);
+            const status = await response.json();
+            if (['finished', 'failed', 'stopped', 'canceled'].includes(status.state) || status.error) {
+                return status;
+            }
+        }
+        throw new Error('Analysis timed out. Please try again later.');
+    }
+
     // Analysis Logic
     analyzeBtn.addEventListener('click', async () => {
         const file = fileInput.files[0];
@@ -59,7 +74,12 @@ document.addEventListener('DOMContentLoaded', () => {
                 body: formData
             });
 
-            const result = await response.json();
+            let result = await response.json();
+
+            // Queued analyses return a job id; poll until the worker finishes
+            if (result.job_id) {
+                result = await pollJob(result.status_url);
+            }
 
             if (!result.success) {
                 throw new Error(result.error || 'Analysis failed');
@@ -0,0 +1,71 @@
+import pytest
+
+from ats_logic import _catalog_courses, _load_course_catalog
+
+
+def _titles(skill):
+    return [course["title"] for course in _catalog_courses(skill)]
+
+
+@pytest.mark.parametrize("skill, canonical", [
+    ("Python", "python"),
+    ("Python Programming", "python"),
+    ("ReactJS", "react"),
+    ("Node.js", "node.js"),
+    ("AWS", "amazon web services"),
+    ("Amazon Web Services (AWS)", "amazon web services"),
+    ("Golang", "go"),
+    ("R", "r"),
+    ("Scikit Learn", "scikit-learn"),
+    ("Ruby Programming", "ruby"),
+    ("Rust Programming", "rust"),
+    ("iOS", "ios development"),
+    ("Java Programming", "java"),
+    ("Java", "java"),
+    ("JavaScript", "javascript"),
+    ("C++", "c++"),
+    ("C#", "c#"),
+])
+def test_matches_catalog_entry(skill, canonical):
+    assert _titles(skill) == [course["title"] for course in _load_course_catalog()[canonical]]
+
+
+@pytest.mark.parametrize("skill, wrong", [
+    ("Go-to-market strategy", "go"),
+    ("R&D", "r"),
+    ("Research and Development", "r"),
+    ("Frontend Development", "ios development"),
+    ("Full Stack Development", "ios development"),
+    ("Game Development", "ios development"),
+    ("Software Development", "ios development"),
+    ("Web Development", "android development"),
+    ("Risk Management", "project management"),
+    ("Team Management", "project management"),
+    ("Machine Learning Operations", "machine learning"),
+    ("Rust Programming", "r"),
+    ("Ruby Programming", "r"),
+    ("C Programming", "go"),
+    ("D Programming", "go"),
+    ("Product Management", "project management"),
+    ("Nest.js", "next.js"),
+    ("Java", "javascript"),
+    ("JavaScript", "java"),
+    ("C++", "c#"),
+    ("C#", "c++"),
+])
+def test_rejects_false_matches(skill, wrong):
+    assert _catalog_courses(skill) != _load_course_catalog()[wrong]
+
+
+@pytest.mark.parametrize("skill", [
+    "Go-to-market strategy",
+    "R&D",
+    "Web Development",
+    "Risk Management",
+    "C Programming",
+    "D Programming",
+    "Product Management",
+    "Nest.js",
+])
+def test_unlisted_skills_get_no_courses(skill):
+    assert _catalog_courses(skill) == []